@@ -1,13 +1,30 @@
 import os
-import requests
+import sys
+import logging
+import logging.handlers
+import httpx
 import mimetypes
 import sqlite3
 import json
-from datetime import datetime
+import orjson
+from collections import Counter, OrderedDict
+import queue
+import threading
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import base64
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from functools import wraps
 import re
+from tempfile import SpooledTemporaryFile
 
-from flask import Flask, request, jsonify, Response, g, redirect, url_for, abort
+from flask import Flask, Request, request, jsonify, Response, redirect, url_for, abort, stream_with_context
+from flask.json.provider import JSONProvider
+from markupsafe import Markup, escape
 
 # ========= Environment variables =========
 def _must_env(key: str) -> str:
@@ -29,16 +46,65 @@ ADMIN_PASSWORD   = _must_env("ADMIN_PASSWORD")
 TZ_NAME          = os.getenv("TZ", "Asia/Baghdad")
 WEBHOOK_DEBUG    = os.getenv("WEBHOOK_DEBUG", "0") == "1"
 
-UPLOAD_FOLDER    = "/tmp/whatsapp_images"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
 DISK_MOUNT_PATH  = os.getenv("DISK_MOUNT_PATH", "/var/data")
 DB_FILE_NAME     = os.getenv("DB_FILE_NAME", "whatsapp_stats.db")
 DB_PATH          = os.path.join(DISK_MOUNT_PATH, DB_FILE_NAME)
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+LOG_LEVEL        = os.getenv("LOG_LEVEL", "INFO").upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    LOG_LEVEL = "INFO"
+
+# ========= Logging =========
+# Request threads only put records on a queue; the listener thread does the
+# actual stdout writes so a slow terminal/journald never stalls a send.
+_log_records = queue.SimpleQueue()
+_log_stream = logging.StreamHandler(sys.stdout)
+_log_stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_records, _log_stream)
+_log_handler = logging.handlers.QueueHandler(_log_records)
+_log_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=LOG_LEVEL, handlers=[_log_handler])
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+log = logging.getLogger("whatsbot")
+
 # ========= Flask =========
+# WhatsApp rejects images over 5MB, so uploads up to that size are kept in
+# memory instead of Werkzeug spilling anything over 500KB to a temp file
+# that is then read straight back out for the Graph upload.
+MAX_IMAGE_BYTES  = 5 * 1024 * 1024
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=MAX_IMAGE_BYTES, mode="rb+")
+
+class OrjsonProvider(JSONProvider):
+    # jsonify/get_json go through this; orjson is several times faster than
+    # the stdlib encoder for the admin endpoints' lists of small dicts.
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.json = OrjsonProvider(app)
+# Room for one full-size image plus the multipart framing and form fields.
+app.config["MAX_CONTENT_LENGTH"] = MAX_IMAGE_BYTES + 64 * 1024
+
+# Admin CSS/JS live in static/ and are requested as ?v=<ASSETS_VERSION>, so
+# browsers may cache them for good; bump the version whenever they change.
+ASSETS_VERSION = "2"
+app.jinja_env.globals["ASSETS_VERSION"] = ASSETS_VERSION
+
+@app.after_request
+def _cache_static(resp):
+    if request.path.startswith(app.static_url_path + "/") and resp.status_code == 200:
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
 
 # ========= Timezone helper =========
 try:
@@ -47,99 +113,354 @@ try:
 except Exception:
     TZ = None
 
-def now_local():
-    return datetime.now(TZ) if TZ else datetime.now()
+# (epoch second, ISO timestamp, day) for the current second; formatting is
+# only redone when the second changes. Rebound as a whole tuple so readers
+# never see a timestamp and day from different seconds.
+_stamp_cache = (0, "", "")
+
+def local_stamp():
+    global _stamp_cache
+    cached = _stamp_cache
+    sec = int(time.time())
+    if sec != cached[0]:
+        n = datetime.fromtimestamp(sec, TZ) if TZ else datetime.fromtimestamp(sec)
+        cached = _stamp_cache = (sec, n.isoformat(timespec="seconds"), n.strftime("%Y-%m-%d"))
+    return cached
 
 def today_str():
-    return now_local().strftime("%Y-%m-%d")
+    return local_stamp()[2]
 
 # ========= Database =========
-def get_db():
-    if "db" not in g:
-        g.db = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
-        g.db.row_factory = sqlite3.Row
-    return g.db
-
-@app.teardown_appcontext
-def close_db(exc):
-    db = g.pop("db", None)
-    if db is not None:
-        db.close()
+# Writes go through a single writer connection guarded by a lock; reads use a
+# small pool of read-only connections, which WAL lets run alongside a write.
+# journal_mode=WAL is persisted in the database file and is set by the writer;
+# the remaining PRAGMAs are per-connection. Reads go through a shared mmap of
+# the file, so each connection only needs a modest private page cache.
+DB_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+READER_POOL_SIZE = 4
+
+_writer = None
+_writer_lock = threading.Lock()
+_readers = queue.LifoQueue(maxsize=READER_POOL_SIZE)
+
+def _connect(target, **kwargs):
+    db = sqlite3.connect(target, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, **kwargs)
+    db.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        db.execute(pragma)
+    return db
+
+def _connect_writer():
+    db = _connect(DB_PATH, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+@contextmanager
+def write_db():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _connect_writer()
+        yield _writer
+
+@contextmanager
+def read_db():
+    try:
+        db = _readers.get_nowait()
+    except queue.Empty:
+        db = _connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        yield db
+    finally:
+        try:
+            _readers.put_nowait(db)
+        except queue.Full:
+            db.close()
 
+# Runs once per process at import (see Startup below). It uses its own
+# short-lived connection so nothing opened here survives into forked workers.
 def init_db():
-    db = get_db()
-    db.execute(
-        """
-        CREATE TABLE IF NOT EXISTS sent_images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ts   TEXT NOT NULL,
-            day  TEXT NOT NULL,
-            phone TEXT NOT NULL,
-            name  TEXT
+    db = _connect_writer()
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sent_images (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts   TEXT NOT NULL,
+                day  TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                name  TEXT
+            )
+            """
         )
-        """
-    )
-    db.commit()
+        # (day, ts DESC) serves both the per-day listing and lookups by day alone.
+        db.execute("CREATE INDEX IF NOT EXISTS idx_sent_day_ts ON sent_images(day, ts DESC)")
+        # Per-day counters kept in step with sent_images by the stats writer, so
+        # the admin pages read O(days) rows instead of grouping the whole table.
+        has_totals = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_totals'"
+        ).fetchone()
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS daily_totals (
+                day TEXT PRIMARY KEY,
+                cnt INTEGER NOT NULL
+            )
+            """
+        )
+        if not has_totals:
+            db.execute(
+                "INSERT INTO daily_totals (day, cnt) SELECT day, COUNT(*) FROM sent_images GROUP BY day"
+            )
+        db.execute("COMMIT")
+    finally:
+        db.close()
+
+# ========= Stats writer =========
+# record_send only enqueues; a background thread drains the queue and writes
+# up to STATS_BATCH_SIZE rows (or whatever arrived within STATS_FLUSH_INTERVAL)
+# in a single transaction, so a burst of sends costs one fsync, not one each.
+STATS_BATCH_SIZE     = 100
+STATS_FLUSH_INTERVAL = 0.2
+
+_stats_queue = queue.Queue()
+_stats_writer = None
+_stats_writer_lock = threading.Lock()
+
+# Bumped after every committed batch so cached stats know they are stale.
+stats_version = 0
+
+def _write_batch(batch):
+    global stats_version
+    with write_db() as db:
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT INTO sent_images (ts, day, phone, name) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            db.executemany(
+                "INSERT INTO daily_totals (day, cnt) VALUES (?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET cnt = cnt + excluded.cnt",
+                Counter(row[1] for row in batch).items(),
+            )
+            db.execute("COMMIT")
+            stats_version += 1
+        except Exception as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            log.error("Stats logging error: %s", e)
+
+def _stats_writer_loop():
+    while True:
+        item = _stats_queue.get()
+        if item is None:
+            break
+        batch = [item]
+        deadline = time.monotonic() + STATS_FLUSH_INTERVAL
+        while len(batch) < STATS_BATCH_SIZE:
+            try:
+                item = _stats_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        _write_batch(batch)
+        if item is None:
+            break
+
+def _ensure_stats_writer():
+    global _stats_writer
+    with _stats_writer_lock:
+        if _stats_writer is None or not _stats_writer.is_alive():
+            _stats_writer = threading.Thread(target=_stats_writer_loop, name="stats-writer", daemon=True)
+            _stats_writer.start()
+
+@atexit.register
+def _stop_stats_writer():
+    if _stats_writer is not None and _stats_writer.is_alive():
+        _stats_queue.put(None)
+        _stats_writer.join(timeout=5)
 
 def record_send(phone, name):
-    db = get_db()
-    t = now_local().isoformat(timespec="seconds")
-    d = today_str()
-    db.execute(
-        "INSERT INTO sent_images (ts, day, phone, name) VALUES (?, ?, ?, ?)",
-        (t, d, phone, name or None),
-    )
-    db.commit()
+    _, t, d = local_stamp()
+    _ensure_stats_writer()
+    _stats_queue.put((t, d, phone, name or None))
 
+# ========= Queries =========
 def daily_counts(limit_days=365):
-    db = get_db()
-    cur = db.execute(
-        "SELECT day, COUNT(*) as cnt FROM sent_images GROUP BY day ORDER BY day DESC LIMIT ?",
-        (limit_days,)
-    )
-    rows = cur.fetchall()
-    return list(reversed([(r["day"], r["cnt"]) for r in rows]))
+    # A primary-key range scan over the last limit_days local calendar days,
+    # already in ascending order for the chart.
+    since = (date.fromisoformat(today_str()) - timedelta(days=limit_days - 1)).isoformat()
+    with read_db() as db:
+        cur = db.execute(
+            "SELECT day, cnt FROM daily_totals WHERE day >= ? ORDER BY day ASC",
+            (since,)
+        )
+        return [(r["day"], r["cnt"]) for r in cur]
 
 def list_days(limit_days=365):
-    db = get_db()
-    cur = db.execute(
-        "SELECT day, COUNT(*) as cnt FROM sent_images GROUP BY day ORDER BY day DESC LIMIT ?",
-        (limit_days,)
-    )
-    return cur.fetchall()
-
-def rows_by_day(day):
-    db = get_db()
-    cur = db.execute(
-        "SELECT ts, phone, name FROM sent_images WHERE day = ? ORDER BY ts DESC",
-        (day,)
-    )
-    return cur.fetchall()
-
-def today_rows():
-    return rows_by_day(today_str())
+    with read_db() as db:
+        return db.execute(
+            "SELECT day, cnt FROM daily_totals ORDER BY day DESC LIMIT ?",
+            (limit_days,)
+        ).fetchall()
+
+def count_by_day(day):
+    with read_db() as db:
+        row = db.execute("SELECT cnt FROM daily_totals WHERE day = ?", (day,)).fetchone()
+    return row["cnt"] if row else 0
+
+def adjacent_days(day):
+    # Nearest earlier and later days that have sends: two primary-key seeks.
+    with read_db() as db:
+        row = db.execute(
+            "SELECT (SELECT MAX(day) FROM daily_totals WHERE day < ?), "
+            "(SELECT MIN(day) FROM daily_totals WHERE day > ?)",
+            (day, day)
+        ).fetchone()
+    return row[0], row[1]
+
+def day_marker(day):
+    # (count, latest ts) changes whenever a row is added to the day; both come
+    # from index lookups, so this is cheap enough to run before the rows.
+    with read_db() as db:
+        row = db.execute(
+            "SELECT (SELECT cnt FROM daily_totals WHERE day = ?), "
+            "(SELECT MAX(ts) FROM sent_images WHERE day = ?)",
+            (day, day)
+        ).fetchone()
+    return row[0] or 0, row[1]
+
+# Newest first. Rows sharing a second are ordered by id ascending, which is
+# the order idx_sent_day_ts already stores them in, so paging is a pure
+# index range scan. `after` is the (ts, id) of the last row of the previous
+# page (keyset pagination), so a page costs O(limit) however deep it is.
+def iter_rows_by_day(day, limit=-1, after=None):
+    with read_db() as db:
+        if after is None:
+            cur = db.execute(
+                "SELECT id, ts, phone, name FROM sent_images WHERE day = ? "
+                "ORDER BY ts DESC, id ASC LIMIT ?",
+                (day, limit)
+            )
+        else:
+            ts, row_id = after
+            cur = db.execute(
+                "SELECT id, ts, phone, name FROM sent_images WHERE day = ? "
+                "AND ts <= ? AND (ts < ? OR id > ?) "
+                "ORDER BY ts DESC, id ASC LIMIT ?",
+                (day, ts, ts, row_id, limit)
+            )
+        yield from cur
+
+def rows_by_day(day, limit=-1, after=None):
+    return list(iter_rows_by_day(day, limit, after))
+
+def dashboard_data(day, limit_days=7, limit_rows=-1):
+    # Everything the dashboard shows in one statement: the day's count, the
+    # latest limit_days totals and the day's newest rows, tagged by `kind`.
+    # Each branch is an index range scan and UNION ALL keeps their order.
+    with read_db() as db:
+        cur = db.execute(
+            "SELECT 'c' AS kind, NULL AS day, cnt, NULL AS ts, NULL AS phone, NULL AS name "
+            "FROM daily_totals WHERE day = ? "
+            "UNION ALL "
+            "SELECT * FROM (SELECT 'd', day, cnt, NULL, NULL, NULL "
+            "FROM daily_totals ORDER BY day DESC LIMIT ?) "
+            "UNION ALL "
+            "SELECT * FROM (SELECT 'r', NULL, NULL, ts, phone, name "
+            "FROM sent_images WHERE day = ? ORDER BY ts DESC, id ASC LIMIT ?)",
+            (day, limit_days, day, limit_rows)
+        )
+        count, days, rows = 0, [], []
+        for r in cur:
+            kind = r["kind"]
+            if kind == "r":
+                rows.append(r)
+            elif kind == "d":
+                days.append(r)
+            else:
+                count = r["cnt"]
+    return count, days, rows
 
 # ========= WhatsApp API helpers =========
-def upload_media(file_path):
-    url = f"https://graph.facebook.com/{GRAPH_VERSION}/{PHONE_NUMBER_ID}/media"
-    mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-    with open(file_path, 'rb') as f:
-        files = {'file': (os.path.basename(file_path), f, mime_type)}
-        data = {"messaging_product": "whatsapp"}
-        resp = requests.post(url, headers=headers, files=files, data=data, timeout=60)
-    print("Upload response:", resp.status_code, resp.text)
+# One HTTP/2 client for all Graph API calls: concurrent uploads and sends
+# (the ?async=1 pool) are multiplexed over a single TLS connection to
+# graph.facebook.com instead of each opening its own. The transport retries
+# failed connects, which happen before anything is sent.
+HTTP_CLIENT = httpx.Client(
+    timeout=60.0,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    ),
+    headers={"Authorization": f"Bearer {WHATSAPP_TOKEN}"},
+)
+atexit.register(HTTP_CLIENT.close)
+# httpx logs every request at INFO; upload/send already log their status.
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+GRAPH_URL        = f"https://graph.facebook.com/{GRAPH_VERSION}/{PHONE_NUMBER_ID}"
+MEDIA_URL        = f"{GRAPH_URL}/media"
+MESSAGES_URL     = f"{GRAPH_URL}/messages"
+
+# Only 429/503 are retried because Graph has not acted on the request,
+# whereas replaying a message after a 5xx gateway error could send it twice.
+# A Retry-After longer than GRAPH_RETRY_MAX_WAIT seconds is not waited out:
+# the 429/503 goes straight back rather than pinning a request thread.
+GRAPH_RETRY_STATUSES = (429, 503)
+GRAPH_RETRIES        = 3
+GRAPH_RETRY_MAX_WAIT = 5
+
+def _graph_post(url, **kwargs):
+    for attempt in range(GRAPH_RETRIES + 1):
+        resp = HTTP_CLIENT.post(url, **kwargs)
+        if resp.status_code not in GRAPH_RETRY_STATUSES or attempt == GRAPH_RETRIES:
+            return resp
+        retry_after = resp.headers.get("Retry-After", "")
+        delay = int(retry_after) if retry_after.isdigit() else 0.3 * 2 ** attempt
+        if delay > GRAPH_RETRY_MAX_WAIT:
+            return resp
+        time.sleep(delay)
+
+# The bot almost always uploads photos, so the common extensions skip the
+# mimetypes module (which loads the system mime database on first use).
+MIME_TYPES = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+def _mime_type(filename):
+    ext = filename.rsplit(".", 1)[-1].lower()
+    return MIME_TYPES.get(ext) or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+def upload_media(data, filename):
+    mime_type = _mime_type(filename)
+    # `data` is the image as bytes: httpx sizes a file object via fileno(),
+    # which would force a SpooledTemporaryFile onto disk, and bytes can be
+    # re-sent as-is on retry.
+    resp = _graph_post(
+        MEDIA_URL,
+        data={"messaging_product": "whatsapp"},
+        files={"file": (filename, data, mime_type)},
+    )
+    log.info("Upload response: %s", resp.status_code)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Upload body: %s", resp.text)
     resp.raise_for_status()
     return resp.json()["id"]
 
 def send_template_with_media_id(to_number, media_id, name_param):
     if not name_param:
         name_param = "User"
-    url = f"https://graph.facebook.com/{GRAPH_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json"
-    }
     payload = {
         "messaging_product": "whatsapp",
         "to": to_number,
@@ -153,11 +474,49 @@ def send_template_with_media_id(to_number, media_id, name_param):
             ]
         }
     }
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    print("Send response:", resp.status_code, resp.text)
+    resp = _graph_post(MESSAGES_URL, json=payload)
+    log.info("Send response: %s", resp.status_code)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Send body: %s", resp.text)
     resp.raise_for_status()
     return resp.json()
 
+# ========= Media cache =========
+# The same picture is often sent to many recipients. Graph keeps uploaded
+# media for 30 days, so remember content hash -> media_id and skip the
+# upload on repeats; entries are dropped a day early to stay inside that.
+MEDIA_CACHE_SIZE = 512
+MEDIA_CACHE_TTL  = 29 * 24 * 3600
+
+_media_cache = OrderedDict()
+_media_cache_lock = threading.Lock()
+
+def content_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def cached_media_id(digest):
+    with _media_cache_lock:
+        entry = _media_cache.get(digest)
+        if entry is None:
+            return None
+        media_id, stored = entry
+        if time.time() - stored > MEDIA_CACHE_TTL:
+            del _media_cache[digest]
+            return None
+        _media_cache.move_to_end(digest)
+        return media_id
+
+def remember_media_id(digest, media_id):
+    with _media_cache_lock:
+        _media_cache[digest] = (media_id, time.time())
+        _media_cache.move_to_end(digest)
+        while len(_media_cache) > MEDIA_CACHE_SIZE:
+            _media_cache.popitem(last=False)
+
+def forget_media_id(digest):
+    with _media_cache_lock:
+        _media_cache.pop(digest, None)
+
 # ========= Webhook (GET + POST filtered) =========
 def _is_for_this_number(value: dict) -> bool:
     try:
@@ -178,7 +537,17 @@ def webhook():
         return "Forbidden", 403
 
     # POST
-    payload = request.get_json(force=True, silent=True) or {}
+    # المحتوى يُستخدم للطباعة فقط، فبدون WEBHOOK_DEBUG لا داعي لقراءته أصلاً
+    if not WEBHOOK_DEBUG:
+        return "OK", 200
+
+    raw = request.get_data(cache=False)
+    try:
+        payload = orjson.loads(raw) if raw else {}
+    except orjson.JSONDecodeError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
     entries = payload.get("entry", []) or []
 
     for entry in entries:
@@ -187,51 +556,107 @@ def webhook():
             if not _is_for_this_number(value):
                 # صامت: لا نطبع شيء نهائياً
                 continue
-            if WEBHOOK_DEBUG:
-                # طباعة مختصرة عند الحاجة فقط
-                if isinstance(value.get("statuses"), list):
-                    for st in value["statuses"]:
-                        print(f"[webhook] status id={st.get('id')} status={st.get('status')} ts={st.get('timestamp')}")
-                if isinstance(value.get("messages"), list):
-                    for msg in value["messages"]:
-                        print(f"[webhook] inbound id={msg.get('id')} from={msg.get('from')} type={msg.get('type')}")
+            # طباعة مختصرة عند الحاجة فقط
+            if isinstance(value.get("statuses"), list):
+                for st in value["statuses"]:
+                    log.info("[webhook] status id=%s status=%s ts=%s", st.get("id"), st.get("status"), st.get("timestamp"))
+            if isinstance(value.get("messages"), list):
+                for msg in value["messages"]:
+                    log.info("[webhook] inbound id=%s from=%s type=%s", msg.get("id"), msg.get("from"), msg.get("type"))
 
     return "OK", 200
 
 # ========= API endpoint =========
+_SANITIZE_RE = re.compile(r"[^\w.\-]+")
+
+# Runs ?async=1 sends after the response has gone out. Each queued send
+# holds its image until it finishes, so the images in flight are capped at
+# ASYNC_MAX_PENDING_BYTES per worker; beyond that the client is told to retry.
+ASYNC_MAX_PENDING_BYTES = 32 * 1024 * 1024
+
+_SEND_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="send")
+_pending_bytes = 0
+_pending_lock = threading.Lock()
+
+def _reserve_pending(n):
+    global _pending_bytes
+    with _pending_lock:
+        if _pending_bytes + n > ASYNC_MAX_PENDING_BYTES:
+            return False
+        _pending_bytes += n
+        return True
+
+def _release_pending(n):
+    global _pending_bytes
+    with _pending_lock:
+        _pending_bytes -= n
+
+def _deliver(data, filename, phone_number, user_name):
+    digest = content_digest(data)
+    media_id = cached_media_id(digest)
+    if media_id is None:
+        media_id = upload_media(data, filename)
+        remember_media_id(digest, media_id)
+    try:
+        result = send_template_with_media_id(phone_number, media_id, user_name)
+    except Exception:
+        # The media may have expired or been removed on Graph's side;
+        # make the next send of this picture upload it again.
+        forget_media_id(digest)
+        raise
+    try:
+        record_send(phone_number, user_name)
+    except Exception as log_err:
+        log.error("Stats logging error: %s", log_err)
+    return result
+
+def _deliver_async(data, filename, phone_number, user_name):
+    try:
+        _deliver(data, filename, phone_number, user_name)
+    except Exception as e:
+        log.error("Async send error: %s %s", phone_number, e)
+    finally:
+        _release_pending(len(data))
+
 @app.route("/send-image", methods=["POST"])
 def send_image():
     if "file" not in request.files or "to" not in request.form:
         return jsonify(error="Missing file or to"), 400
 
     phone_number = request.form["to"].strip()
-    user_name = (request.form.get("name") or "").strip()
+    user_name = (request.form.get("name") or "").strip() or "User"
     file = request.files["file"]
 
-    safe_name = re.sub(r"[^\w\.\-]+", "_", file.filename or "upload.jpg")
-    save_path = os.path.join(UPLOAD_FOLDER, safe_name)
-    file.save(save_path)
+    safe_name = _SANITIZE_RE.sub("_", file.filename or "upload.jpg")
+    # At most MAX_IMAGE_BYTES, already in memory; read it once for both the
+    # digest and the upload, and so async sends outlive the request's stream.
+    data = file.stream.read()
 
-    try:
-        media_id = upload_media(save_path)
-        result = send_template_with_media_id(phone_number, media_id, user_name or "User")
+    if request.args.get("async") == "1":
+        if not _reserve_pending(len(data)):
+            return jsonify(error="Too many queued sends, retry shortly"), 503, {"Retry-After": "1"}
         try:
-            init_db()
-            record_send(phone_number, user_name or "User")
-        except Exception as log_err:
-            print("Stats logging error:", log_err)
-        return jsonify(result)
+            _SEND_POOL.submit(_deliver_async, data, safe_name, phone_number, user_name)
+        except Exception:
+            _release_pending(len(data))
+            raise
+        return jsonify(queued=True), 202
+
+    try:
+        return jsonify(_deliver(data, safe_name, phone_number, user_name))
     except Exception as e:
         return jsonify(error=str(e)), 500
-    finally:
-        try:
-            os.remove(save_path)
-        except Exception:
-            pass
 
 # ========= Auth =========
+# Base64 credentials exactly as a browser sends them after "Basic ", so the
+# common case is one constant-time compare without parsing the header.
+_EXPECTED_AUTH = base64.b64encode(f"{ADMIN_USERNAME}:{ADMIN_PASSWORD}".encode())
+
 def check_auth(username, password):
-    return username == ADMIN_USERNAME and password == ADMIN_PASSWORD
+    # `&`, not `and`: always compare the password too, so a wrong username
+    # does not answer measurably faster than a wrong password.
+    return (hmac.compare_digest((username or "").encode(), ADMIN_USERNAME.encode())
+            & hmac.compare_digest((password or "").encode(), ADMIN_PASSWORD.encode()))
 
 def authenticate():
     return Response("Authentication required", 401,
@@ -241,6 +666,9 @@ def authenticate():
 def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if header[:6].lower() == "basic " and hmac.compare_digest(header[6:].strip().encode(), _EXPECTED_AUTH):
+            return f(*args, **kwargs)
         auth = request.authorization
         if not auth or not check_auth(auth.username, auth.password):
             return authenticate()
@@ -248,76 +676,79 @@ def requires_auth(f):
     return wrapper
 
 # ========= Admin HTML helpers =========
+# Most rows any admin page renders at once; longer days are paged.
+DAY_PAGE_SIZE = 200
+
+ROW_TMPL = '<tr><td>{ts}</td><td>{phone}</td><td>{name}</td></tr>'.format_map
+
 def _rows_table_html(rows):
     if not rows:
         return '<tr><td colspan="3" class="text-muted">لا توجد بيانات بعد اليوم.</td></tr>'
-    parts = []
-    for r in rows:
-        parts.append(
-            f"<tr><td>{r['ts']}</td><td>{r['phone']}</td><td>{(r['name'] or '')}</td></tr>"
-        )
-    return "".join(parts)
+    return "".join(
+        ROW_TMPL({"ts": escape(r["ts"]), "phone": escape(r["phone"]), "name": escape(r["name"] or "")})
+        for r in rows
+    )
+
+DAY_ROW_TMPL = (
+    '<tr><td><a href="{prefix}{day}">{day}</a></td>'
+    '<td><span class="badge bg-primary">{cnt}</span></td>'
+    '<td><a class="btn btn-sm btn-outline-secondary" href="{prefix}{day}.json" target="_blank">JSON</a></td></tr>'
+).format_map
+DAY_LINK_TMPL = (
+    '<a class="btn btn-sm btn-outline-primary me-2 mb-2" href="{prefix}{day}">{day} '
+    '<span class="badge bg-primary">{cnt}</span></a>'
+).format_map
+
+def _day_url_prefix():
+    # admin_day and admin_day_json share the "/admin/day/" prefix; resolve it
+    # once per page rather than calling url_for twice for every listed day.
+    return url_for("admin_day", day="_")[:-1]
 
 def _days_table_html(days_rows):
     if not days_rows:
         return '<tr><td colspan="3" class="text-muted">لا توجد بيانات بعد.</td></tr>'
-    out = []
-    for r in days_rows:
-        link = url_for("admin_day", day=r["day"])
-        jurl = url_for("admin_day_json", day=r["day"])
-        out.append(
-            f'<tr><td><a href="{link}">{r["day"]}</a></td>'
-            f'<td><span class="badge bg-primary">{r["cnt"]}</span></td>'
-            f'<td><a class="btn btn-sm btn-outline-secondary" href="{jurl}" target="_blank">JSON</a></td></tr>'
-        )
-    return "".join(out)
+    prefix = _day_url_prefix()
+    return "".join(
+        DAY_ROW_TMPL({"prefix": prefix, "day": escape(r["day"]), "cnt": r["cnt"]})
+        for r in days_rows
+    )
+
+def _day_links_html(days_rows):
+    prefix = _day_url_prefix()
+    return "".join(
+        DAY_LINK_TMPL({"prefix": prefix, "day": escape(r["day"]), "cnt": r["cnt"]})
+        for r in days_rows
+    )
 
 # ========= Admin Panel =========
 @app.route("/")
 def root_redirect():
     return redirect(url_for("admin_panel"))
 
-@app.route("/admin")
-@requires_auth
-def admin_panel():
-    init_db()
-    rows = today_rows()
-    count_today = len(rows)
-    days = list_days(limit_days=7)
-    quick_links = "".join(
-        f'<a class="btn btn-sm btn-outline-primary me-2 mb-2" href="{url_for("admin_day", day=d["day"])}">{d["day"]} <span class="badge bg-primary">{d["cnt"]}</span></a>'
-        for d in days
-    )
-    rows_html = _rows_table_html(rows)
-
-    html = f"""
+PANEL_TEMPLATE = app.jinja_env.from_string("""
 <!doctype html>
 <html lang="ar" dir="rtl">
 <head>
   <meta charset="utf-8">
   <title>لوحة التحكم - WhatsApp Images</title>
   <meta name="viewport" content="width=device-width, initial-scale=1">
+  <link rel="preconnect" href="https://cdn.jsdelivr.net">
+  <link rel="preload" href="{{ url_for('daily_json') }}" as="fetch" crossorigin>
   <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-  <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
-  <style>
-    body {{ background:#f4f6fb; color:#111827; }}
-    .card {{ background:#ffffff; border:1px solid #e5e7eb; }}
-    .table thead th {{ color:#374151; }}
-    .muted {{ color:#6b7280; font-size:0.9rem; }}
-    a, a:visited {{ color:#2563eb; }}
-    .chip {{ background:#eef2ff; color:#3730a3; border:1px solid #c7d2fe; border-radius:999px; padding:.25rem .75rem; display:inline-block; }}
-  </style>
+  <script defer src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
+  <link href="{{ url_for('static', filename='admin.css') }}?v={{ ASSETS_VERSION }}" rel="stylesheet">
+  <script defer src="{{ url_for('static', filename='admin.js') }}?v={{ ASSETS_VERSION }}"></script>
 </head>
 <body class="p-3 p-md-4">
   <div class="container-fluid">
     <div class="d-flex flex-wrap align-items-center justify-content-between mb-4">
       <h3 class="m-0">لوحة التحكم (اليوم)</h3>
-      <div class="muted">تاريخ اليوم: {today_str()}</div>
+      <div class="muted">تاريخ اليوم: {{ today }}</div>
     </div>
 
     <div class="d-flex flex-wrap align-items-center mb-3">
-      <a class="btn btn-dark me-2 mb-2" href="{url_for('admin_days')}">قائمة كل الأيام</a>
-      {quick_links}
+      <a class="btn btn-dark me-2 mb-2" href="{{ url_for('admin_days') }}">قائمة كل الأيام</a>
+      {{ quick_links }}
     </div>
 
     <div class="row g-4">
@@ -326,9 +757,9 @@ def admin_panel():
           <div class="d-flex align-items-center justify-content-between">
             <div>
               <div class="muted">إجمالي الصور اليوم</div>
-              <div class="display-6">{count_today}</div>
+              <div class="display-6">{{ count_today }}</div>
             </div>
-            <div class="chip">{TZ_NAME}</div>
+            <div class="chip">{{ tz_name }}</div>
           </div>
           <div class="mt-2 muted">عدد الرسائل المُسجلة في قاعدة البيانات لليوم الحالي.</div>
         </div>
@@ -338,9 +769,9 @@ def admin_panel():
         <div class="card p-3">
           <div class="d-flex align-items-center justify-content-between mb-2">
             <div class="muted">الرسم البياني (عدد الصور اليومية)</div>
-            <a href="{url_for('daily_json')}" target="_blank">JSON</a>
+            <a href="{{ url_for('daily_json') }}" target="_blank">JSON</a>
           </div>
-          <canvas id="dailyChart" height="130"></canvas>
+          <canvas id="dailyChart" height="130" data-src="{{ url_for('daily_json') }}"></canvas>
         </div>
       </div>
 
@@ -348,7 +779,7 @@ def admin_panel():
         <div class="card p-3">
           <div class="d-flex align-items-center justify-content-between">
             <div class="muted">عمليات اليوم (الأحدث أولاً)</div>
-            <span class="chip">{count_today} عملية</span>
+            <span class="chip">{{ count_today }} عملية</span>
           </div>
           <div class="table-responsive mt-3">
             <table class="table table-hover align-middle">
@@ -360,62 +791,70 @@ def admin_panel():
                 </tr>
               </thead>
               <tbody>
-                {rows_html}
+                {{ rows_html }}
               </tbody>
             </table>
           </div>
+          {% if count_today > shown %}
+          <div class="mb-2">
+            <span class="muted me-2">يتم عرض أحدث {{ shown }} عملية فقط.</span>
+            <a class="btn btn-sm btn-outline-secondary" href="{{ url_for('admin_day', day=today) }}">عرض الكل</a>
+          </div>
+          {% endif %}
           <div class="muted">* يتم تسجيل العملية فقط عند نجاح الإرسال.</div>
         </div>
       </div>
     </div>
   </div>
 
-<script>
-async function loadDaily() {{
-  const res = await fetch("{url_for('daily_json')}");
-  const data = await res.json();
-  const labels = data.map(d => d.day);
-  const counts = data.map(d => d.count);
-  const ctx = document.getElementById('dailyChart').getContext('2d');
-  new Chart(ctx, {{
-    type: 'bar',
-    data: {{
-      labels: labels,
-      datasets: [{{ label: 'عدد الصور', data: counts }}]
-    }},
-    options: {{
-      responsive: true,
-      plugins: {{ legend: {{ display: false }} }},
-      scales: {{
-        x: {{ ticks: {{ color: '#111827' }} }},
-        y: {{ ticks: {{ color: '#111827' }}, beginAtZero: true, precision: 0 }}
-      }}
-    }}
-  }});
-}}
-loadDaily();
-</script>
 </body>
 </html>
-    """
-    return html
+""")
 
-@app.route("/admin/daily.json")
+@app.route("/admin")
 @requires_auth
-def daily_json():
-    init_db()
+def admin_panel():
+    today = today_str()
+    count_today, days, rows = dashboard_data(today, limit_days=7, limit_rows=DAY_PAGE_SIZE)
+    return PANEL_TEMPLATE.render(
+        today=today, tz_name=TZ_NAME, count_today=count_today, shown=len(rows),
+        quick_links=Markup(_day_links_html(days)), rows_html=Markup(_rows_table_html(rows)),
+    )
+
+# The chart polls this endpoint; keep the encoded body and its ETag until the
+# stats writer commits again. The TTL bounds staleness from other workers,
+# whose writes do not bump this process's stats_version.
+DAILY_CACHE_TTL = 5.0
+
+_daily_cache = {"version": None, "expires": 0.0, "body": b"", "etag": ""}
+_daily_cache_lock = threading.Lock()
+
+def _daily_json_cached():
+    now = time.monotonic()
+    with _daily_cache_lock:
+        if _daily_cache["version"] == stats_version and now < _daily_cache["expires"]:
+            return _daily_cache["body"], _daily_cache["etag"]
+    version = stats_version
     data = [{"day": d, "count": c} for d, c in daily_counts(limit_days=365)]
-    return jsonify(data)
+    body = app.json.dumps(data).encode()
+    etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+    with _daily_cache_lock:
+        _daily_cache.update(version=version, expires=now + DAILY_CACHE_TTL, body=body, etag=etag)
+    return body, etag
 
-# ======== أيام ========
-@app.route("/admin/days")
+@app.route("/admin/daily.json")
 @requires_auth
-def admin_days():
-    init_db()
-    rows = list_days(limit_days=365)
-    html_rows = _days_table_html(rows)
+def daily_json():
+    body, etag = _daily_json_cached()
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    # Authenticated data: never stored by shared caches, always revalidated.
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
-    html = f"""
+# ======== أيام ========
+DAYS_TEMPLATE = app.jinja_env.from_string("""
 <!doctype html>
 <html lang="ar" dir="rtl">
 <head>
@@ -423,17 +862,13 @@ def admin_days():
   <title>قائمة الأيام - WhatsApp Images</title>
   <meta name="viewport" content="width=device-width, initial-scale=1">
   <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-  <style>
-    body {{ background:#f4f6fb; color:#111827; }}
-    .card {{ background:#ffffff; border:1px solid #e5e7eb; }}
-    .muted {{ color:#6b7280; font-size:0.9rem; }}
-  </style>
+  <link href="{{ url_for('static', filename='admin.css') }}?v={{ ASSETS_VERSION }}" rel="stylesheet">
 </head>
 <body class="p-3 p-md-4">
   <div class="container-fluid">
     <div class="d-flex align-items-center justify-content-between mb-4">
       <h3 class="m-0">قائمة كل الأيام</h3>
-      <div><a class="btn btn-dark" href="{url_for('admin_panel')}">عودة إلى اليوم</a></div>
+      <div><a class="btn btn-dark" href="{{ url_for('admin_panel') }}">عودة إلى اليوم</a></div>
     </div>
 
     <div class="card p-3">
@@ -447,7 +882,7 @@ def admin_days():
             </tr>
           </thead>
           <tbody>
-            {html_rows}
+            {{ rows_html }}
           </tbody>
         </table>
       </div>
@@ -456,61 +891,44 @@ def admin_days():
   </div>
 </body>
 </html>
-    """
-    return html
+""")
+
+@app.route("/admin/days")
+@requires_auth
+def admin_days():
+    rows = list_days(limit_days=365)
+    return DAYS_TEMPLATE.render(rows_html=Markup(_days_table_html(rows)))
 
 # ======== تفاصيل يوم ========
 DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
-@app.route("/admin/day/<day>")
-@requires_auth
-def admin_day(day):
-    init_db()
-    if not DAY_RE.match(day):
-        abort(400, description="صيغة اليوم غير صحيحة. استخدم YYYY-MM-DD")
-
-    rows = rows_by_day(day)
-    count_day = len(rows)
-    rows_html = _rows_table_html(rows)
-
-    all_days = [r["day"] for r in list_days(limit_days=365)]
-    prev_link = next_link = ""
-    if day in all_days:
-        idx = all_days.index(day)
-        if idx + 1 < len(all_days):
-            prev_link = f'<a class="btn btn-outline-primary me-2" href="{url_for("admin_day", day=all_days[idx+1])}">اليوم السابق</a>'
-        if idx - 1 >= 0:
-            next_link = f'<a class="btn btn-outline-primary" href="{url_for("admin_day", day=all_days[idx-1])}">اليوم التالي</a>'
-
-    html = f"""
+# Compiled once at import; Flask's Jinja environment autoescapes string
+# templates, so ts/phone/name are HTML-escaped as they are rendered.
+DAY_TEMPLATE = app.jinja_env.from_string("""
 <!doctype html>
 <html lang="ar" dir="rtl">
 <head>
   <meta charset="utf-8">
-  <title>تفاصيل اليوم {day} - WhatsApp Images</title>
+  <title>تفاصيل اليوم {{ day }} - WhatsApp Images</title>
   <meta name="viewport" content="width=device-width, initial-scale=1">
   <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-  <style>
-    body {{ background:#f4f6fb; color:#111827; }}
-    .card {{ background:#ffffff; border:1px solid #e5e7eb; }}
-    .muted {{ color:#6b7280; font-size:0.9rem; }}
-    .chip {{ background:#eef2ff; color:#3730a3; border:1px solid #c7d2fe; border-radius:999px; padding:.25rem .75rem; display:inline-block; }}
-  </style>
+  <link href="{{ url_for('static', filename='admin.css') }}?v={{ ASSETS_VERSION }}" rel="stylesheet">
 </head>
 <body class="p-3 p-md-4">
   <div class="container-fluid">
     <div class="d-flex flex-wrap align-items-center justify-content-between mb-4">
-      <h3 class="m-0">تفاصيل اليوم: {day}</h3>
+      <h3 class="m-0">تفاصيل اليوم: {{ day }}</h3>
       <div class="d-flex align-items-center">
-        <a class="btn btn-dark me-2" href="{url_for('admin_days')}">قائمة كل الأيام</a>
-        <a class="btn btn-secondary" href="{url_for('admin_panel')}">اليوم الحالي</a>
+        <a class="btn btn-dark me-2" href="{{ url_for('admin_days') }}">قائمة كل الأيام</a>
+        <a class="btn btn-secondary" href="{{ url_for('admin_panel') }}">اليوم الحالي</a>
       </div>
     </div>
 
     <div class="mb-3">
-      {prev_link} {next_link}
-      <span class="chip ms-2">المجموع: {count_day}</span>
-      <a class="btn btn-outline-secondary ms-2" href="{url_for('admin_day_json', day=day)}" target="_blank">JSON</a>
+      {% if prev_day %}<a class="btn btn-outline-primary me-2" href="{{ url_for('admin_day', day=prev_day) }}">اليوم السابق</a>{% endif %}
+      {% if next_day %}<a class="btn btn-outline-primary" href="{{ url_for('admin_day', day=next_day) }}">اليوم التالي</a>{% endif %}
+      <span class="chip ms-2">المجموع: {{ count_day }}</span>
+      <a class="btn btn-outline-secondary ms-2" href="{{ url_for('admin_day_json', day=day) }}" target="_blank">JSON</a>
     </div>
 
     <div class="card p-3">
@@ -524,33 +942,78 @@ def admin_day(day):
             </tr>
           </thead>
           <tbody>
-            {rows_html}
+            {% for r in rows %}<tr><td>{{ r['ts'] }}</td><td>{{ r['phone'] }}</td><td>{{ r['name'] or '' }}</td></tr>
+            {% else %}<tr><td colspan="3" class="text-muted">لا توجد بيانات بعد اليوم.</td></tr>
+            {% endfor %}
           </tbody>
         </table>
       </div>
+      <div class="d-flex align-items-center mb-2">
+        {% if paged %}<a class="btn btn-sm btn-outline-secondary me-2" href="{{ url_for('admin_day', day=day) }}">العودة إلى الأحدث</a>{% endif %}
+        {% if next_token %}<a class="btn btn-sm btn-outline-secondary me-2" href="{{ url_for('admin_day', day=day, page_token=next_token) }}">تحميل المزيد</a>{% endif %}
+      </div>
       <div class="muted">* الأحدث أولاً. يتم تسجيل العملية فقط عند نجاح الإرسال.</div>
     </div>
   </div>
 </body>
 </html>
-    """
-    return html
+""")
+
+def _parse_page_token(token):
+    # "<ts>|<id>" of the last row shown; anything malformed restarts at the top.
+    ts, _, row_id = (token or "").rpartition("|")
+    if not ts or not row_id.isdigit():
+        return None
+    return ts, int(row_id)
+
+@app.route("/admin/day/<day>")
+@requires_auth
+def admin_day(day):
+    if not DAY_RE.match(day):
+        abort(400, description="صيغة اليوم غير صحيحة. استخدم YYYY-MM-DD")
+
+    count_day = count_by_day(day)
+    prev_day, next_day = adjacent_days(day)
+
+    after = _parse_page_token(request.args.get("page_token"))
+    rows = rows_by_day(day, DAY_PAGE_SIZE + 1, after)
+    next_token = None
+    if len(rows) > DAY_PAGE_SIZE:
+        rows = rows[:DAY_PAGE_SIZE]
+        next_token = f"{rows[-1]['ts']}|{rows[-1]['id']}"
+
+    stream = DAY_TEMPLATE.stream(
+        day=day, count_day=count_day, rows=rows, paged=after is not None,
+        next_token=next_token, prev_day=prev_day, next_day=next_day,
+    )
+    stream.enable_buffering(size=50)
+    return Response(stream_with_context(stream), mimetype="text/html")
 
 @app.route("/admin/day/<day>.json")
 @requires_auth
 def admin_day_json(day):
-    init_db()
     if not DAY_RE.match(day):
         abort(400, description="صيغة اليوم غير صحيحة. استخدم YYYY-MM-DD")
+    cnt, last_ts = day_marker(day)
+    etag = hashlib.blake2b(f"{cnt}:{last_ts}".encode(), digest_size=8).hexdigest()
+    # Weak comparison, as If-None-Match requires and make_conditional uses.
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
     rows = rows_by_day(day)
     data = [{"ts": r["ts"], "phone": r["phone"], "name": r["name"]} for r in rows]
-    return jsonify({"day": day, "count": len(rows), "rows": data})
+    resp = jsonify({"day": day, "count": len(rows), "rows": data})
+    resp.set_etag(etag)
+    return resp
+
+# ========= Startup =========
+init_db()
 
 # ========= Main =========
 if __name__ == "__main__":
-    with app.app_context():
-        init_db()
     port = int(os.getenv("PORT", "8000"))
     # عند النشر على Render استخدم أمر تشغيل مثل:
-    # gunicorn -b 0.0.0.0:$PORT WhatsBot:app
+    # gunicorn -w 2 -k gthread --threads 8 --keep-alive 65 -b 0.0.0.0:$PORT WhatsBot:app
+    # (نفس الأمر موجود في Procfile)
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,25 @@
+async function loadDaily() {
+  const canvas = document.getElementById('dailyChart');
+  if (!canvas) return;
+  const res = await fetch(canvas.dataset.src);
+  const data = await res.json();
+  const labels = data.map(d => d.day);
+  const counts = data.map(d => d.count);
+  const ctx = canvas.getContext('2d');
+  new Chart(ctx, {
+    type: 'bar',
+    data: {
+      labels: labels,
+      datasets: [{ label: 'عدد الصور', data: counts }]
+    },
+    options: {
+      responsive: true,
+      plugins: { legend: { display: false } },
+      scales: {
+        x: { ticks: { color: '#111827' } },
+        y: { ticks: { color: '#111827' }, beginAtZero: true, precision: 0 }
+      }
+    }
+  });
+}
+document.addEventListener("DOMContentLoaded", loadDaily);